@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# Benchmark storage facts of a large synthetic ESXi inventory built from real
+# pyVmomi data objects: the former raw-value fact builder against to_facts(),
+# both followed by what AnsibleModule.exit_json() does with the result
+# (remove_values() and jsonify()).
+#
+#   python tests/bench_esxi_facts.py [luns]
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from pyVmomi import vim
+from ansible.module_utils.basic import jsonify, remove_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from vmware_esxi_facts import EsxiFacts, bytes_to_human
+
+PATHS_PER_LUN = 4
+ROUNDS = 5
+
+
+class Obj(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def inventory(luns):
+    string_array = vim.host.StorageSystem._GetPropertyInfo('systemFile').type
+    storage_system = Obj(
+        systemFile=string_array(['/vmfs/volumes/ds{0}/system'.format(i) for i in range(luns // 10)]),
+        storageDeviceInfo=vim.host.StorageDeviceInfo(
+            hostBusAdapter=[vim.host.FibreChannelHba(device='vmhba{0}'.format(i), key='hba-{0}'.format(i),
+                                                     bus=i, status='online', model='QLE2692',
+                                                     driver='qlnativefc', pci='0000:{0:02x}:00.0'.format(i))
+                            for i in range(8)],
+            scsiLun=[vim.host.ScsiDisk(uuid='0200{0:012x}'.format(i), displayName='LUN {0}'.format(i),
+                                       lunType='disk', vendor='NETAPP', revision='9600', scsiLevel=6)
+                     for i in range(luns)],
+        ),
+        fileSystemVolumeInfo=vim.host.FileSystemVolumeInfo(
+            volumeTypeList=['VMFS', 'NFS', 'NFS41', 'vsan', 'VVOL', 'VFFS', 'OTHER', 'PMEM'],
+            mountInfo=[vim.host.FileSystemMountInfo(
+                mountInfo=vim.host.MountInfo(path='/vmfs/volumes/ds{0}'.format(i), accessMode='readWrite',
+                                             mounted=True, accessible=True),
+                volume=vim.host.VmfsVolume(name='ds{0}'.format(i), capacity=i << 30, type='VMFS'),
+                vStorageSupport='vStorageUnsupported',
+            ) for i in range(luns // 4)],
+        ),
+        multipathStateInfo=vim.host.MultipathStateInfo(
+            path=[vim.host.MultipathStateInfo.Path(name='vmhba{0}:C0:T{1}:L{2}'.format(p, i // 256, i % 256),
+                                                   pathState='active')
+                  for i in range(luns) for p in range(PATHS_PER_LUN)]),
+    )
+    return Obj(configManager=Obj(storageSystem=storage_system))
+
+
+def legacy_storage_facts(host_system):
+    # get_storage_facts() as it was before to_facts(), returning pyVmomi
+    # values as-is.
+    facts = dict(hba={}, lun={}, multipath={}, systemfile=[], mountinfo={})
+    facts['systemfile'] = host_system.configManager.storageSystem.systemFile
+
+    storage_device_info = host_system.configManager.storageSystem.storageDeviceInfo
+    for hba in storage_device_info.hostBusAdapter:
+        facts['hba'][hba.device] = {}
+        for attr in ['key', 'bus', 'status', 'model', 'driver', 'pci']:
+            facts['hba'][hba.device][attr] = getattr(hba, attr)
+
+    for lun in storage_device_info.scsiLun:
+        facts['lun'][lun.uuid] = {}
+        for attr in ['displayName', 'lunType', 'vendor', 'revision', 'scsiLevel']:
+            facts['lun'][lun.uuid][attr] = getattr(lun, attr)
+
+    filesystem_volume_info = host_system.configManager.storageSystem.fileSystemVolumeInfo
+    facts['volumeTypeList'] = filesystem_volume_info.volumeTypeList
+
+    for m in filesystem_volume_info.mountInfo:
+        facts['mountinfo'][m.volume.name] = dict(
+            capacity=bytes_to_human(m.volume.capacity),
+            type=m.volume.type,
+            vStorageSupport=m.vStorageSupport,
+            path=m.mountInfo.path,
+            accessMode=m.mountInfo.accessMode,
+            mounted=m.mountInfo.mounted,
+            accessible=m.mountInfo.accessible,
+        )
+
+    multipath_state_info = host_system.configManager.storageSystem.multipathStateInfo
+    for p in multipath_state_info.path:
+        facts['multipath'][p.name] = p.pathState
+
+    return facts
+
+
+def exit_json(facts):
+    result = dict(changed=False, ansible_facts=dict(esxi_facts=dict(storage=facts)))
+    return jsonify(remove_values(result, set()))
+
+
+def measure(name, build, host_system):
+    build_timings = []
+    exit_timings = []
+    for i in range(ROUNDS):
+        gc.collect()
+        start = time.process_time()
+        facts = build(host_system)
+        built = time.process_time()
+        output = exit_json(facts)
+        build_timings.append(built - start)
+        exit_timings.append(time.process_time() - built)
+        del facts
+
+    gc.collect()
+    tracemalloc.start()
+    exit_json(build(host_system))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print('{0:<10} build {1:6.3f}s  exit_json {2:6.3f}s  peak {3:6.1f} MiB  output {4:6.1f} MiB'.format(
+        name, min(build_timings), min(exit_timings), peak / 2.0 ** 20, len(output) / 2.0 ** 20))
+    return output
+
+
+def main():
+    luns = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    host_system = inventory(luns)
+    print('{0} LUNs, {1} paths, best of {2} rounds'.format(luns, luns * PATHS_PER_LUN, ROUNDS))
+
+    legacy = measure('legacy', legacy_storage_facts, host_system)
+    current = measure('to_facts', lambda h: EsxiFacts(None, ['storage'], h).get_storage_facts(), host_system)
+    assert legacy == current
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# Measure requests, bytes on the wire and wall time of a vmware_esxi_facts
+# 'types: all' run (including connect_to_api) against the fake SOAP server
+# behind a simulated slow link:
+#
+#   gzip            responses compressed, as negotiated by pyVmomi
+#   identity        server ignoring Accept-Encoding
+#   gzip, legacy    storage facts reading configManager.storageSystem for
+#                   every property, as before it was resolved once
+#
+#   python tests/bench_transport.py [luns] [latency_ms] [bandwidth_kib]
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_esxi_facts import legacy_storage_facts
+from fake_soap import FakeVimServer, connect, esxi_inventory
+
+from vmware_esxi_facts import EsxiFacts, SUPPORTED_TYPES
+
+ALL_TYPES = [t for t in SUPPORTED_TYPES if t != 'all']
+
+
+class LegacyEsxiFacts(EsxiFacts):
+    def get_storage_facts(self):
+        return legacy_storage_facts(self.host_system)
+
+
+def measure(name, inventory, facts_class, compress, latency, bandwidth):
+    with FakeVimServer(inventory, compress=compress, latency=latency, bandwidth=bandwidth) as server:
+        start = time.time()
+        facts_class(None, ALL_TYPES, connect(server)).get_facts()
+        elapsed = time.time() - start
+        requests = [r for r in server.requests if r['command'] == 'POST']
+
+    print('{0:<14} {1:>8} {2:>12} {3:>12} {4:>12} {5:>9.2f}s'.format(
+        name, len(requests), sum(r['request_bytes'] for r in requests),
+        sum(r['payload_bytes'] for r in requests), sum(r['wire_bytes'] for r in requests), elapsed))
+
+
+def main():
+    luns = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000.0
+    bandwidth = (int(sys.argv[3]) if len(sys.argv) > 3 else 512) * 1024
+    inventory = esxi_inventory(luns=luns, datastores=32)
+
+    print('{0} LUNs, {1} paths, {2:.0f} ms round trip, {3} KiB/s'.format(
+        luns, luns * 4, latency * 1000, bandwidth // 1024))
+    print('{0:<14} {1:>8} {2:>12} {3:>12} {4:>12} {5:>10}'.format(
+        '', 'requests', 'sent', 'payload', 'received', 'wall'))
+    measure('gzip', inventory, EsxiFacts, True, latency, bandwidth)
+    measure('identity', inventory, EsxiFacts, False, latency, bandwidth)
+    measure('gzip, legacy', inventory, LegacyEsxiFacts, True, latency, bandwidth)
+
+
+if __name__ == '__main__':
+    main()
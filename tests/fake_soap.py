@@ -0,0 +1,313 @@
+# Minimal vSphere SOAP endpoint for exercising the pyVmomi transport used by
+# the modules: it answers the calls made by connect_to_api() and by property
+# reads of an in-memory ESXi inventory, optionally gzip-compresses responses,
+# simulates latency and bandwidth, and records every request it serves.
+
+import datetime
+import gzip
+import io
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pyVmomi import SoapAdapter, VmomiSupport, vim
+
+
+VERSION = VmomiSupport.GetServiceVersions('vim25')[0]
+NS = VmomiSupport.GetWsdlNamespace(VERSION)
+SOAPENV = '{http://schemas.xmlsoap.org/soap/envelope/}'
+
+SERVICE_VERSIONS = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<namespaces version="1.0"><namespace><name>{0}</name>'
+                    '<version>{1}</version></namespace></namespaces>'
+                    ).format(NS, VmomiSupport.versionIdMap[VERSION])
+
+# Return types of the non-accessor methods that are answered.
+METHODS = {
+    'RetrieveServiceContent': vim.ServiceInstanceContent,
+    'Login': vim.UserSession,
+    'CreateContainerView': vim.view.ContainerView,
+    'DestroyView': None,
+    'Logout': None,
+}
+
+
+def esxi_inventory(luns=64, paths_per_lun=4, datastores=8, nics=4):
+    """Return {moId: {property: value}} for a single ESXi host."""
+    host = vim.HostSystem('host-1')
+    storage_system = vim.host.StorageSystem('storageSystem-1')
+    network_system = vim.host.NetworkSystem('networkSystem-1')
+    datastore_refs = [vim.Datastore('datastore-{0}'.format(i)) for i in range(datastores)]
+    now = datetime.datetime(2017, 6, 1, 12, 0, 0)
+
+    about = vim.AboutInfo(name='VMware ESXi', fullName='VMware ESXi 6.5.0 build-5310538', vendor='VMware, Inc.',
+                          version='6.5.0', build='5310538', osType='vmnix-x86', productLineId='embeddedEsx',
+                          apiType='HostAgent', apiVersion='6.5')
+
+    inventory = {
+        'ServiceInstance': {},
+        'group-d1': {},
+        'SessionManager': {},
+        'propertyCollector': {},
+        'ViewManager': {},
+        'session[0]view-1': {'view': [host]},
+        'host-1': {
+            'name': 'esxi-001.example.com',
+            'config': vim.host.ConfigInfo(host=host, product=about),
+            'summary': vim.host.Summary(hardware=vim.host.Summary.HardwareSummary(
+                vendor='HP', model='ProLiant DL380 Gen9', uuid='30393137-3436-584d-5136-323430323750',
+                memorySize=512 << 30, cpuModel='Intel(R) Xeon(R) CPU E5-2680 v4 @ 2.40GHz', cpuMhz=2400,
+                numCpuPkgs=2, numCpuCores=28, numCpuThreads=56, numNics=nics, numHBAs=4)),
+            'datastore': datastore_refs,
+            'configManager': vim.host.ConfigManager(storageSystem=storage_system, networkSystem=network_system),
+        },
+        'networkSystem-1': {
+            'networkInfo': vim.host.NetworkInfo(
+                pnic=[vim.host.PhysicalNic(key='key-vim.host.PhysicalNic-vmnic{0}'.format(i),
+                                           device='vmnic{0}'.format(i), driver='ixgbe',
+                                           mac='3c:a8:2a:0b:7e:{0:02x}'.format(i), pci='0000:04:00.{0}'.format(i),
+                                           linkSpeed=vim.host.PhysicalNic.LinkSpeedDuplex(speedMb=10000,
+                                                                                          duplex=True))
+                      for i in range(nics)],
+                vnic=[vim.host.VirtualNic(device='vmk0', portgroup='Management Network',
+                                          spec=vim.host.VirtualNic.Specification(
+                                              mac='3c:a8:2a:0b:7e:00', mtu=1500,
+                                              ip=vim.host.IpConfig(dhcp=False, ipAddress='10.0.0.11',
+                                                                   subnetMask='255.255.255.0')))],
+                portgroup=[vim.host.PortGroup(key='key-vim.host.PortGroup-Management Network',
+                                              spec=vim.host.PortGroup.Specification(
+                                                  name='Management Network', vlanId=0, vswitchName='vSwitch0',
+                                                  policy=vim.host.NetworkPolicy()))],
+                vswitch=[vim.host.VirtualSwitch(key='key-vim.host.VirtualSwitch-vSwitch0', name='vSwitch0',
+                                                numPorts=128, numPortsAvailable=120, mtu=1500)],
+            ),
+        },
+        'storageSystem-1': {
+            'systemFile': ['/vmfs/volumes/ds{0}/.sdd.sf'.format(i) for i in range(datastores)],
+            'storageDeviceInfo': vim.host.StorageDeviceInfo(
+                hostBusAdapter=[vim.host.FibreChannelHba(device='vmhba{0}'.format(i), key='hba-{0}'.format(i),
+                                                         bus=i, status='online', model='QLE2692',
+                                                         driver='qlnativefc', pci='0000:{0:02x}:00.0'.format(i),
+                                                         portWorldWideName=i, nodeWorldWideName=i,
+                                                         portType='fabric', speed=16)
+                                for i in range(4)],
+                scsiLun=[vim.host.ScsiDisk(key='key-vim.host.ScsiDisk-{0}'.format(i),
+                                           uuid='0200{0:012x}'.format(i),
+                                           canonicalName='naa.600a0980{0:024x}'.format(i),
+                                           displayName='NETAPP Fibre Channel Disk (naa.600a0980{0:024x})'.format(i),
+                                           lunType='disk', vendor='NETAPP', model='LUN C-Mode', revision='9600',
+                                           scsiLevel=6, operationalState=['ok'],
+                                           capacity=vim.host.DiskDimensions.Lba(blockSize=512, block=1 << 31),
+                                           devicePath='/vmfs/devices/disks/naa.600a0980{0:024x}'.format(i))
+                         for i in range(luns)],
+            ),
+            'fileSystemVolumeInfo': vim.host.FileSystemVolumeInfo(
+                volumeTypeList=['VMFS', 'NFS', 'NFS41', 'vsan', 'VVOL', 'VFFS', 'OTHER', 'PMEM'],
+                mountInfo=[vim.host.FileSystemMountInfo(
+                    mountInfo=vim.host.MountInfo(path='/vmfs/volumes/ds{0}'.format(i), accessMode='readWrite',
+                                                 mounted=True, accessible=True),
+                    volume=vim.host.VmfsVolume(name='ds{0}'.format(i), capacity=2 << 40, type='VMFS',
+                                               blockSizeMb=1, maxBlocks=63 << 20, majorVersion=6,
+                                               version='6.81', uuid='5a1c{0:020x}'.format(i),
+                                               extent=[vim.host.ScsiDisk.Partition(
+                                                   diskName='naa.600a0980{0:024x}'.format(i), partition=1)],
+                                               vmfsUpgradable=False),
+                    vStorageSupport='vStorageUnsupported',
+                ) for i in range(datastores)],
+            ),
+            'multipathStateInfo': vim.host.MultipathStateInfo(
+                path=[vim.host.MultipathStateInfo.Path(name='vmhba{0}:C0:T{1}:L{2}'.format(p, i // 256, i % 256),
+                                                       pathState='active')
+                      for i in range(luns) for p in range(paths_per_lun)]),
+        },
+    }
+
+    for i, ref in enumerate(datastore_refs):
+        inventory[ref._moId] = {'info': vim.host.VmfsDatastoreInfo(
+            name='ds{0}'.format(i), url='ds:///vmfs/volumes/5a1c{0:020x}/'.format(i),
+            freeSpace=1 << 40, maxFileSize=62 << 40, maxVirtualDiskCapacity=62 << 40,
+            containerId='5a1c{0:020x}'.format(i), timestamp=now)}
+
+    return inventory
+
+
+def service_content():
+    return vim.ServiceInstanceContent(
+        rootFolder=vim.Folder('group-d1'),
+        propertyCollector=vim.PropertyCollector('propertyCollector'),
+        viewManager=vim.view.ViewManager('ViewManager'),
+        sessionManager=vim.SessionManager('SessionManager'),
+        about=vim.AboutInfo(name='VMware ESXi', apiType='HostAgent', apiVersion='6.5'))
+
+
+class Serializer(SoapAdapter.SoapSerializer):
+    # The inventory only fills in what the modules read, so leave out unset
+    # fields even where the schema requires them.
+    def _Serialize(self, val, info, defNS):
+        if val is not None:
+            SoapAdapter.SoapSerializer._Serialize(self, val, info, defNS)
+
+
+def serialize_response(method, value, value_type):
+    ns_map = SoapAdapter.SOAP_NSMAP.copy()
+    ns_map[NS] = ''
+    result = ''
+    if value_type is not None:
+        info = VmomiSupport.Object(name='returnval', type=value_type, version=VERSION, flags=0)
+        writer = io.StringIO()
+        Serializer(writer, VERSION, ns_map).Serialize(value, info)
+        result = writer.getvalue()
+    return ''.join([SoapAdapter.XML_HEADER, '\n', SoapAdapter.SOAP_ENVELOPE_START, SoapAdapter.SOAP_BODY_START,
+                    '<{0}Response xmlns="{1}">'.format(method, NS), result, '</{0}Response>'.format(method),
+                    SoapAdapter.SOAP_END]).encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+            self.connection_id = self.server.connections
+
+    def do_GET(self):
+        if self.path.endswith('/vimServiceVersions.xml'):
+            self.respond(200, SERVICE_VERSIONS.encode('utf-8'), 'GET', compressible=False)
+        else:
+            self.respond(404, b'', 'GET', compressible=False)
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers['Content-Length']))
+        call = list(ET.fromstring(request).find(SOAPENV + 'Body'))[0]
+        method = call.tag.split('}')[-1]
+        this = call.find('{{{0}}}_this'.format(NS))
+
+        if method == 'Fetch':
+            prop = call.find('{{{0}}}prop'.format(NS)).text
+            mo_type = VmomiSupport.GetWsdlType(NS, this.get('type'))
+            value_type = mo_type._GetPropertyInfo(prop).type
+            value = self.server.inventory[this.text][prop]
+            if isinstance(value, list):
+                value = value_type(value)
+            name = '{0}.{1}'.format(this.text, prop)
+        elif method in METHODS:
+            value_type = METHODS[method]
+            value = {
+                'RetrieveServiceContent': service_content,
+                'Login': lambda: vim.UserSession(key='52b5', userName='root', fullName='root',
+                                                 loginTime=datetime.datetime(2017, 6, 1),
+                                                 lastActiveTime=datetime.datetime(2017, 6, 1),
+                                                 locale='en', messageLocale='en', extensionSession=False),
+                'CreateContainerView': lambda: vim.view.ContainerView('session[0]view-1'),
+            }.get(method, lambda: None)()
+            name = method
+        else:
+            raise NotImplementedError(method)
+
+        self.respond(200, serialize_response(method, value, value_type), name, len(request))
+
+    def respond(self, status, body, name, request_bytes=0, compressible=True):
+        # Simulate the round trip before answering.
+        time.sleep(self.server.latency)
+
+        accept_encoding = self.headers.get('Accept-Encoding', '')
+        headers = [('Content-Type', 'text/xml; charset=utf-8')]
+        payload_bytes = len(body)
+        if compressible and self.server.compress and 'gzip' in accept_encoding:
+            body = gzip.compress(body)
+            headers.append(('Content-Encoding', 'gzip'))
+        headers.append(('Content-Length', str(len(body))))
+
+        head = ['HTTP/1.1 {0} {1}\r\n'.format(status, self.responses[status][0])]
+        head.extend('{0}: {1}\r\n'.format(k, v) for k, v in headers)
+        data = ''.join(head).encode('latin-1') + b'\r\n' + body
+
+        # Record the request before the client can see the response.
+        with self.server.lock:
+            self.server.requests.append(dict(
+                name=name, command=self.command, connection=self.connection_id,
+                accept_encoding=accept_encoding, request_bytes=request_bytes,
+                payload_bytes=payload_bytes, wire_bytes=len(data)))
+
+        # Limit the bandwidth by trickling the response out in chunks.
+        chunk = 16384
+        for offset in range(0, len(data), chunk):
+            part = data[offset:offset + chunk]
+            self.wfile.write(part)
+            if self.server.bandwidth:
+                time.sleep(len(part) / float(self.server.bandwidth))
+        self.wfile.flush()
+
+
+class FakeVimServer(object):
+    """HTTPS vSphere endpoint on 127.0.0.1, usable as a context manager."""
+
+    def __init__(self, inventory=None, compress=True, latency=0.0, bandwidth=None):
+        self.tmpdir = tempfile.mkdtemp()
+        cert = os.path.join(self.tmpdir, 'cert.pem')
+        key = os.path.join(self.tmpdir, 'key.pem')
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                               '-subj', '/CN=localhost', '-keyout', key, '-out', cert],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+        self.httpd.inventory = inventory if inventory is not None else esxi_inventory()
+        self.httpd.compress = compress
+        self.httpd.latency = latency
+        self.httpd.bandwidth = bandwidth
+        self.httpd.lock = threading.Lock()
+        self.httpd.connections = 0
+        self.httpd.requests = []
+        self.port = self.httpd.server_address[1]
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def reset(self):
+        with self.httpd.lock:
+            del self.httpd.requests[:]
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self.tmpdir)
+
+
+class Module(object):
+    """Enough of AnsibleModule for connect_to_api()."""
+
+    def __init__(self, port):
+        self.params = dict(hostname='127.0.0.1', username='root', password='secret', port=port,
+                           validate_certs=False, proxy_host=None, proxy_port=None)
+
+    def fail_json(self, **kwargs):
+        raise AssertionError(kwargs)
+
+
+def connect(server):
+    """Connect to the server through connect_to_api() and return the host."""
+    from ansible.module_utils.vmware import connect_to_api, get_all_objs
+
+    content = connect_to_api(Module(server.port), disconnect_atexit=False)
+    return list(get_all_objs(content, [vim.HostSystem]))[0]
@@ -0,0 +1,62 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+pytest.importorskip('pyVmomi')
+pytest.importorskip('ansible.module_utils.vmware')
+if not shutil.which('openssl'):
+    pytest.skip('openssl is needed to create the fake server certificate', allow_module_level=True)
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_soap import FakeVimServer, connect
+
+from vmware_esxi_facts import EsxiFacts, SUPPORTED_TYPES
+
+ALL_TYPES = [t for t in SUPPORTED_TYPES if t != 'all']
+
+
+@pytest.fixture
+def server():
+    with FakeVimServer() as server:
+        yield server
+
+
+def soap_requests(server):
+    return [r for r in server.requests if r['command'] == 'POST']
+
+
+def test_facts_run_requests_compression(server):
+    EsxiFacts(None, ALL_TYPES, connect(server)).get_facts()
+
+    requests = soap_requests(server)
+    assert requests
+    assert set(r['accept_encoding'] for r in requests) == set(['gzip, deflate'])
+
+    storage = [r for r in requests if r['name'] == 'storageSystem-1.storageDeviceInfo'][0]
+    assert storage['wire_bytes'] < storage['payload_bytes'] / 4
+
+
+def test_facts_run_reuses_one_connection(server):
+    EsxiFacts(None, ALL_TYPES, connect(server)).get_facts()
+
+    # Only the API version probe of SmartConnect uses a connection of its own.
+    assert len(set(r['connection'] for r in soap_requests(server))) == 1
+
+
+def test_storage_facts_resolve_storage_system_once(server):
+    host_system = connect(server)
+    server.reset()
+
+    EsxiFacts(None, ['storage'], host_system).get_storage_facts()
+
+    assert [r['name'] for r in soap_requests(server)] == [
+        'host-1.configManager',
+        'storageSystem-1.systemFile',
+        'storageSystem-1.storageDeviceInfo',
+        'storageSystem-1.fileSystemVolumeInfo',
+        'storageSystem-1.multipathStateInfo',
+    ]
@@ -0,0 +1,154 @@
+import datetime
+import inspect
+import os
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('pyVmomi')
+pytest.importorskip('ansible.module_utils.vmware')
+
+from pyVmomi import vim, vmodl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import vmware_datetime_config
+import vmware_service
+from vmware_datetime_config import get_datetime_systems, measure_skew, verify_datetime
+
+
+class Stub(object):
+    poolSize = 5
+
+
+class View(vim.view.ContainerView):
+    def Destroy(self):
+        pass
+
+
+class ViewManager(object):
+    def CreateContainerView(self, container, types, recursive):
+        return View('session[0]view-1')
+
+
+class RetrieveResult(object):
+    def __init__(self, objects, token=None):
+        self.objects = objects
+        self.token = token
+
+
+class PropertyCollector(object):
+    _stub = Stub()
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def RetrievePropertiesEx(self, specs, options):
+        return RetrieveResult(self.objects)
+
+
+class Content(object):
+    def __init__(self, objects=None):
+        self.viewManager = ViewManager()
+        self.propertyCollector = PropertyCollector(objects)
+
+
+class Offset(datetime.tzinfo):
+    def __init__(self, hours):
+        self.offset = datetime.timedelta(hours=hours)
+
+    def utcoffset(self, dt):
+        return self.offset
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+
+class DateTimeSystem(vim.host.DateTimeSystem):
+    # Answers with the controller clock shifted by skew, or with the given
+    # epoch readings in turn.
+    def __init__(self, moid, skew=0.0, readings=None, tz=None, fail=False):
+        vim.host.DateTimeSystem.__init__(self, moid)
+        self.skew = skew
+        self.readings = list(readings or [])
+        self.tz = tz
+        self.fail = fail
+
+    def QueryDateTime(self):
+        if self.fail:
+            raise vim.fault.HostConfigFault(msg='QueryDateTime failed')
+        epoch = self.readings.pop(0) if self.readings else time.time() + self.skew
+        if self.tz is None:
+            return datetime.datetime.utcfromtimestamp(epoch)
+        return datetime.datetime.fromtimestamp(epoch, self.tz)
+
+
+class Clock(object):
+    # Stands in for the time module, returning the given times in turn.
+    def __init__(self, times):
+        self.times = list(times)
+
+    def time(self):
+        return self.times.pop(0)
+
+
+@pytest.mark.parametrize('tz', [None, Offset(2), Offset(-5)])
+def test_measure_skew_uses_midpoint_of_fastest_sample(monkeypatch, tz):
+    # Sample 2 has the lowest round trip; its host reading lies 0.5s after
+    # the midpoint, but 0.6s after the start and 0.4s after the end.
+    monkeypatch.setattr(vmware_datetime_config, 'time', Clock([100.0, 100.6, 200.0, 200.2, 300.0, 300.4]))
+    datetime_system = DateTimeSystem('dateTimeSystem-1', readings=[101.0, 200.6, 300.0], tz=tz)
+
+    assert measure_skew(datetime_system) == dict(skew=0.5, rtt=0.2)
+
+
+def test_verify_datetime_flags_hosts_beyond_max_skew():
+    systems = {'esxi-1': DateTimeSystem('dateTimeSystem-1', skew=2.5),
+               'esxi-2': DateTimeSystem('dateTimeSystem-2', skew=0.0, tz=Offset(1)),
+               'esxi-3': DateTimeSystem('dateTimeSystem-3', skew=-0.3)}
+
+    time_skew, out_of_sync = verify_datetime(Content(), systems, 1.0)
+
+    assert time_skew['esxi-1']['skew'] == pytest.approx(2.5, abs=0.05)
+    assert time_skew['esxi-2']['skew'] == pytest.approx(0.0, abs=0.05)
+    assert time_skew['esxi-3']['skew'] == pytest.approx(-0.3, abs=0.05)
+    assert out_of_sync == ['esxi-1']
+
+
+def test_verify_datetime_reports_failed_hosts():
+    systems = {'esxi-1': DateTimeSystem('dateTimeSystem-1'),
+               'esxi-2': DateTimeSystem('dateTimeSystem-2', fail=True)}
+
+    time_skew, out_of_sync = verify_datetime(Content(), systems, 1.0)
+
+    assert set(time_skew['esxi-1']) == set(['skew', 'rtt'])
+    assert time_skew['esxi-2'] == dict(msg='QueryDateTime failed')
+    assert out_of_sync == ['esxi-2']
+
+
+def object_content(name, state='connected'):
+    prop_set = [vmodl.DynamicProperty(name='name', val=name),
+                vmodl.DynamicProperty(name='runtime.connectionState', val=state)]
+    if state == 'connected':
+        prop_set.append(vmodl.DynamicProperty(name='configManager.dateTimeSystem',
+                                              val=DateTimeSystem('dateTimeSystem-' + name)))
+    return vmodl.query.PropertyCollector.ObjectContent(obj=vim.HostSystem(name), propSet=prop_set)
+
+
+def test_get_datetime_systems_skips_disconnected_hosts():
+    content = Content([object_content('esxi-3', 'notResponding'), object_content('esxi-1'),
+                       object_content('esxi-2', 'disconnected')])
+
+    systems, skipped = get_datetime_systems(content, vim.ClusterComputeResource('domain-c1'))
+
+    assert list(systems) == ['esxi-1']
+    assert isinstance(systems['esxi-1'], vim.host.DateTimeSystem)
+    assert skipped == ['esxi-2', 'esxi-3']
+
+
+def test_shared_helpers_match_vmware_service():
+    assert vmware_datetime_config.PARALLEL_HOSTS == vmware_service.PARALLEL_HOSTS
+    for name in ('get_host_properties', 'run_parallel'):
+        assert inspect.getsource(getattr(vmware_datetime_config, name)) == \
+            inspect.getsource(getattr(vmware_service, name))
@@ -0,0 +1,120 @@
+import datetime
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('pyVmomi')
+pytest.importorskip('ansible.module_utils.vmware')
+
+from pyVmomi import vim, VmomiSupport
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import vmware_esxi_facts
+from vmware_esxi_facts import EsxiFacts, FIELD_TABLES, to_facts
+
+
+class Obj(object):
+    # Stand-in for the managed objects on the path to the data objects.
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def storage_host():
+    storage_system = Obj(
+        systemFile=vim.host.StorageSystem._GetPropertyInfo('systemFile').type(['/etc/a', '/etc/b']),
+        storageDeviceInfo=vim.host.StorageDeviceInfo(
+            hostBusAdapter=[vim.host.BlockHba(device='vmhba0', key='key-vim.host.BlockHba-vmhba0', bus=3,
+                                              status='online', model='Smart Array', driver='hpsa', pci='0000:03:00.0')],
+            scsiLun=[vim.host.ScsiDisk(uuid='0200', displayName='Local disk', lunType='disk',
+                                       vendor='HP', revision='3.00', scsiLevel=6)],
+        ),
+        fileSystemVolumeInfo=vim.host.FileSystemVolumeInfo(
+            volumeTypeList=['VMFS', 'NFS'],
+            mountInfo=[vim.host.FileSystemMountInfo(
+                mountInfo=vim.host.MountInfo(path='/vmfs/volumes/ds1', accessMode='readWrite',
+                                             mounted=True, accessible=True),
+                volume=vim.host.VmfsVolume(name='ds1', capacity=1024, type='VMFS'),
+                vStorageSupport='vStorageUnsupported',
+            )],
+        ),
+        multipathStateInfo=vim.host.MultipathStateInfo(
+            path=[vim.host.MultipathStateInfo.Path(name='vmhba0:C0:T0:L0', pathState='active')]),
+    )
+    return Obj(configManager=Obj(storageSystem=storage_system))
+
+
+def assert_plain(value):
+    # Only builtin types may be handed back to Ansible.
+    if isinstance(value, dict):
+        assert type(value) is dict
+        for k, v in value.items():
+            assert_plain(k)
+            assert_plain(v)
+    elif isinstance(value, list):
+        assert type(value) is list
+        for v in value:
+            assert_plain(v)
+    else:
+        assert type(value) in (type(None), bool, int, float, str), type(value)
+
+
+def test_to_facts_uses_field_table():
+    about = vim.AboutInfo(name='VMware ESXi', version='6.5.0', build='5310538', apiVersion='6.5')
+
+    facts = to_facts(about)
+
+    assert sorted(facts) == sorted(FIELD_TABLES['vim.AboutInfo'])
+    assert facts['version'] == '6.5.0'
+    assert_plain(facts)
+
+
+def test_to_facts_subclass_uses_base_table():
+    lun = vim.host.ScsiDisk(displayName='Local disk', lunType='disk', scsiLevel=6)
+
+    facts = to_facts(lun)
+
+    assert facts == dict(displayName='Local disk', lunType='disk', vendor=None, revision=None, scsiLevel=6)
+    assert_plain(facts)
+
+
+def test_to_facts_managed_object():
+    assert to_facts(vim.HostSystem('host-42')) == 'host-42'
+
+
+def test_storage_facts():
+    facts = EsxiFacts(None, ['storage'], storage_host()).get_storage_facts()
+
+    assert facts['systemfile'] == ['/etc/a', '/etc/b']
+    assert facts['volumeTypeList'] == ['VMFS', 'NFS']
+    assert facts['hba']['vmhba0'] == dict(key='key-vim.host.BlockHba-vmhba0', bus=3, status='online',
+                                          model='Smart Array', driver='hpsa', pci='0000:03:00.0')
+    assert facts['lun']['0200']['lunType'] == 'disk'
+    assert facts['mountinfo']['ds1'] == dict(capacity=vmware_esxi_facts.bytes_to_human(1024), type='VMFS',
+                                             vStorageSupport='vStorageUnsupported', path='/vmfs/volumes/ds1',
+                                             accessMode='readWrite', mounted=True, accessible=True)
+    assert facts['multipath'] == {'vmhba0:C0:T0:L0': 'active'}
+    assert_plain(facts)
+    json.dumps(facts)
+
+
+def test_to_facts_without_table_drops_dynamic_data_fields():
+    path = vim.host.MultipathStateInfo.Path(name='vmhba0:C0:T0:L0', pathState='active')
+
+    assert to_facts(path) == dict(name='vmhba0:C0:T0:L0', pathState='active')
+
+
+def test_to_facts_converts_non_plain_fields():
+    hardware = vim.host.Summary.HardwareSummary(vendor='HP', cpuMhz=2600, numCpuCores=VmomiSupport.GetVmodlType('short')(16), numHBAs=2)
+    info = vim.host.VmfsDatastoreInfo(url='ds:///vmfs/volumes/ds1/', containerId='c1',
+                                      timestamp=datetime.datetime(2017, 6, 1, 12, 0, 0))
+
+    hardware_facts = to_facts(hardware)
+    info_facts = to_facts(info)
+
+    assert type(hardware.numCpuCores) is not int
+    assert type(hardware_facts['numCpuCores']) is int
+    assert info_facts == dict(url='ds:///vmfs/volumes/ds1/', containerId='c1', timestamp='2017-06-01T12:00:00')
+    assert_plain(hardware_facts)
@@ -0,0 +1,188 @@
+import os
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip('pyVmomi')
+pytest.importorskip('ansible.module_utils.vmware')
+
+from pyVmomi import vim, vmodl
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import vmware_service
+from vmware_service import get_host_properties, manage_service_scope, run_parallel
+
+
+class Failed(Exception):
+    pass
+
+
+class Module(object):
+    def fail_json(self, **kwargs):
+        raise Failed(kwargs)
+
+
+class Stub(object):
+    poolSize = 5
+
+
+class View(vim.view.ContainerView):
+    destroyed = False
+
+    def Destroy(self):
+        self.destroyed = True
+
+
+class ViewManager(object):
+    def CreateContainerView(self, container, types, recursive):
+        self.view = View('session[0]view-1')
+        return self.view
+
+
+class RetrieveResult(object):
+    def __init__(self, objects, token=None):
+        self.objects = objects
+        self.token = token
+
+
+class PropertyCollector(object):
+    _stub = Stub()
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def RetrievePropertiesEx(self, specs, options):
+        self.specs = specs
+        return self.pages[0]
+
+    def ContinueRetrievePropertiesEx(self, token):
+        return self.pages[int(token)]
+
+
+class Content(object):
+    def __init__(self, pages=None):
+        self.viewManager = ViewManager()
+        self.propertyCollector = PropertyCollector(pages)
+
+
+class ServiceSystem(vim.host.ServiceSystem):
+    def __init__(self, moid, fail=None):
+        vim.host.ServiceSystem.__init__(self, moid)
+        self.calls = []
+        self.fail = fail
+
+    def _call(self, method):
+        if method == self.fail:
+            raise vim.fault.HostConfigFault(msg='{0} failed'.format(method))
+        self.calls.append(method)
+
+    def StartService(self, key):
+        self._call('StartService')
+
+    def StopService(self, key):
+        self._call('StopService')
+
+    def RestartService(self, key):
+        self._call('RestartService')
+
+    def UpdateServicePolicy(self, key, policy):
+        self._call('UpdateServicePolicy')
+
+
+def host(name, state='connected', running=True, policy='on', fail=None):
+    props = dict(name=name, connected=state)
+    if state == 'connected':
+        props['service_system'] = ServiceSystem('serviceSystem-' + name, fail)
+        props['services'] = [vim.host.Service(key='TSM-SSH', label='SSH', running=running, policy=policy),
+                             vim.host.Service(key='ntpd', label='NTP', running=True, policy='on')]
+    return props
+
+
+def object_content(props):
+    prop_set = [vmodl.DynamicProperty(name='name', val=props['name']),
+                vmodl.DynamicProperty(name='runtime.connectionState', val=props['connected'])]
+    if 'services' in props:
+        prop_set.append(vmodl.DynamicProperty(name='config.service',
+                                              val=vim.host.ServiceInfo(service=props['services'])))
+        prop_set.append(vmodl.DynamicProperty(name='configManager.serviceSystem', val=props['service_system']))
+    return vmodl.query.PropertyCollector.ObjectContent(obj=vim.HostSystem(props['name']), propSet=prop_set)
+
+
+def test_get_host_properties_follows_token_and_destroys_view():
+    content = Content([RetrieveResult([object_content(host('esxi-1'))], token='1'),
+                       RetrieveResult([object_content(host('esxi-2', state='notResponding'))])])
+
+    hosts = get_host_properties(content, vim.ClusterComputeResource('domain-c1'), ['config.service'])
+
+    assert [h['name'] for h in hosts] == ['esxi-1', 'esxi-2']
+    assert hosts[0]['runtime.connectionState'] == 'connected'
+    assert 'config.service' not in hosts[1]
+    assert content.propertyCollector.specs[0].propSet[0].pathSet == ['name', 'runtime.connectionState',
+                                                                     'config.service']
+    assert content.viewManager.view.destroyed
+
+
+def scope(hosts, state='stopped', policy='off'):
+    content = Content([RetrieveResult([object_content(h) for h in hosts])])
+    return manage_service_scope(Module(), content, vim.ClusterComputeResource('domain-c1'),
+                                'TSM-SSH', state, policy)
+
+
+def test_scope_only_contacts_hosts_out_of_compliance():
+    compliant = host('esxi-1', running=False, policy='off')
+    running = host('esxi-2', running=True, policy='off')
+    enabled = host('esxi-3', running=True, policy='on')
+
+    changed, skipped = scope([compliant, running, enabled])
+
+    assert changed == {'esxi-2': ['StopService'], 'esxi-3': ['StopService', 'UpdateServicePolicy']}
+    assert skipped == []
+    assert compliant['service_system'].calls == []
+    assert running['service_system'].calls == ['StopService']
+
+
+def test_scope_skips_disconnected_hosts():
+    changed, skipped = scope([host('esxi-1'), host('esxi-2', state='disconnected'),
+                              host('esxi-3', state='notResponding')])
+
+    assert list(changed) == ['esxi-1']
+    assert skipped == ['esxi-2', 'esxi-3']
+
+
+def test_scope_reports_partial_failure():
+    with pytest.raises(Failed) as e:
+        scope([host('esxi-1'), host('esxi-2', fail='UpdateServicePolicy'), host('esxi-3', state='disconnected')])
+
+    result = e.value.args[0]
+    assert result['changed'] is True
+    assert result['hosts'] == {'esxi-1': ['StopService', 'UpdateServicePolicy'], 'esxi-2': ['StopService']}
+    assert result['skipped_hosts'] == ['esxi-3']
+    assert 'esxi-2: UpdateServicePolicy failed' in result['msg']
+
+
+def test_scope_fails_on_unknown_service():
+    missing = host('esxi-1')
+    missing['services'] = missing['services'][1:]
+
+    with pytest.raises(Failed) as e:
+        scope([missing])
+
+    assert e.value.args[0]['msg'] == 'Could not find service TSM-SSH to manage on esxi-1'
+
+
+def test_run_parallel_is_capped_at_pool_size():
+    threads = set()
+    barrier = threading.Lock()
+
+    def func(item):
+        with barrier:
+            threads.add(threading.current_thread().name)
+        if item == 3:
+            raise ValueError(item)
+
+    errors = run_parallel(Content(), func, range(vmware_service.PARALLEL_HOSTS * 2))
+
+    assert 1 <= len(threads) <= Stub.poolSize
+    assert [(item, str(e)) for item, e in errors] == [(3, '3')]
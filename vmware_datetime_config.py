@@ -41,16 +41,50 @@ options:
     required: false
     description:
       - List of NTP servers that should be configured.
+      - Mutually exclusive with I(verify).
   ntpd_state:
     required: false
     description:
       - State of the ntpd service.
+      - Mutually exclusive with I(verify).
     choices: [ running, stopped, restarted ]
     default: running
   timezone:
     required: false
     description:
       - Name of the timezone to use.
+      - Mutually exclusive with I(verify).
+  verify:
+    required: false
+    description:
+      - Instead of configuring NTP and the timezone, query the clock of every
+        host concurrently and report its skew against the controller clock.
+        Each reading is corrected for the measured round-trip latency.
+      - When I(verify) is not set, I(ntp_servers) is required.
+      - Mutually exclusive with I(ntp_servers), I(ntpd_state) and
+        I(timezone).
+    type: bool
+    default: false
+  max_skew:
+    required: false
+    description:
+      - Maximum allowed skew in seconds before a host is flagged in
+        C(hosts_out_of_sync). Only used with I(verify).
+    type: float
+    default: 1.0
+  cluster_name:
+    required: false
+    description:
+      - Name of a cluster. With I(verify), check every host in this cluster.
+      - Requires I(verify).
+      - Mutually exclusive with I(datacenter_name).
+  datacenter_name:
+    required: false
+    description:
+      - Name of a datacenter. With I(verify), check every host in this
+        datacenter.
+      - Requires I(verify).
+      - Mutually exclusive with I(cluster_name).
 extends_documentation_fragment: vmware.documentation
 '''
 
@@ -67,6 +101,40 @@ EXAMPLES = '''
         - ntp-002.example.com
     ntpd_state: running
     timezone: UTC
+
+- name: Check clock skew of all hosts in a cluster
+  local_action:
+    module: vmware_datetime_config
+    hostname: vcenter_hostname
+    username: administrator@vsphere.local
+    password: your_password
+    cluster_name: cluster-001
+    verify: true
+    max_skew: 0.5
+'''
+
+RETURN = '''
+time_skew:
+    description: Per host clock skew against the controller and round-trip
+                 time of the query, in seconds. Hosts that could not be
+                 queried have a C(msg) with the error instead. Only returned
+                 with I(verify).
+    returned: success
+    type: dict
+    sample: {"esxi-001.example.com": {"skew": 0.012, "rtt": 0.083},
+             "esxi-002.example.com": {"msg": "Connection reset by peer"}}
+hosts_out_of_sync:
+    description: Hosts whose skew exceeds I(max_skew) or that could not be
+                 queried. Only returned with I(verify).
+    returned: success
+    type: list
+    sample: ["esxi-002.example.com"]
+skipped_hosts:
+    description: Hosts that were not checked because they are not connected.
+                 Only returned with I(verify).
+    returned: success
+    type: list
+    sample: ["esxi-003.example.com"]
 '''
 try:
     from pyVmomi import vim, vmodl
@@ -74,6 +142,24 @@ try:
 except ImportError:
     HAS_PYVMOMI = False
 
+import calendar
+import threading
+import time
+
+# Maximum number of hosts worked on concurrently. The number of workers is
+# also capped at the size of pyVmomi's HTTP connection pool, so that every
+# call reuses a pooled keep-alive connection instead of opening its own.
+#
+# PARALLEL_HOSTS, get_host_properties() and run_parallel() are kept identical
+# in vmware_service.py and vmware_datetime_config.py, as every module has to
+# be self-contained.
+PARALLEL_HOSTS = 16
+
+# Number of clock readings taken per host; the one with the lowest
+# round-trip time is used, which also leaves out a first reading that had
+# to set up its connection.
+SKEW_SAMPLES = 3
+
 
 def configure_datetime(module, host_system, ntp_servers, ntpd_state, timezone):
     changed = False
@@ -122,24 +208,173 @@ def configure_datetime(module, host_system, ntp_servers, ntpd_state, timezone):
     return changed
 
 
+def get_host_properties(content, container, path_set):
+    # Fetch the name, connection state and given properties of every host
+    # below the container in a single PropertyCollector retrieval.
+    view = content.viewManager.CreateContainerView(container, [vim.HostSystem], True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseEntities', path='view', skip=False, type=vim.view.ContainerView)
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=view, skip=True, selectSet=[traversal_spec])
+        property_spec = vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.HostSystem, pathSet=['name', 'runtime.connectionState'] + path_set)
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[object_spec], propSet=[property_spec])
+
+        collector = content.propertyCollector
+        result = collector.RetrievePropertiesEx([filter_spec], vmodl.query.PropertyCollector.RetrieveOptions())
+        objects = []
+        while result:
+            objects.extend(result.objects)
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    finally:
+        view.Destroy()
+
+    return [dict((p.name, p.val) for p in obj.propSet) for obj in objects]
+
+
+def run_parallel(content, func, items):
+    # Run func for every item and return the (item, exception) pairs of the
+    # calls that failed. Without a known pool size the items are handled one
+    # at a time over a single connection.
+    stub = content.propertyCollector._stub
+    pool_size = getattr(getattr(stub, 'soapStub', stub), 'poolSize', 1)
+
+    items = list(items)
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not items:
+                    return
+                item = items.pop()
+            try:
+                func(item)
+            except Exception as e:
+                with lock:
+                    errors.append((item, e))
+
+    threads = [threading.Thread(target=worker) for i in range(min(PARALLEL_HOSTS, pool_size, len(items)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return errors
+
+
+def get_datetime_systems(content, container):
+    # Disconnected and not responding hosts are returned separately.
+    systems = {}
+    skipped = []
+    for host in get_host_properties(content, container, ['configManager.dateTimeSystem']):
+        datetime_system = host.get('configManager.dateTimeSystem')
+        if host.get('runtime.connectionState') != 'connected' or datetime_system is None:
+            skipped.append(host['name'])
+        else:
+            systems[host['name']] = datetime_system
+
+    return systems, sorted(skipped)
+
+
+def measure_skew(host_datetime_system):
+    best = None
+    for i in range(SKEW_SAMPLES):
+        start = time.time()
+        host_time = host_datetime_system.QueryDateTime()
+        end = time.time()
+
+        # Assume the host read its clock halfway through the round trip.
+        # pyVmomi returns an aware datetime in UTC, a naive one is taken
+        # to be in UTC as well.
+        rtt = end - start
+        host_epoch = calendar.timegm(host_time.utctimetuple()) + host_time.microsecond / 1e6
+        skew = host_epoch - (start + rtt / 2)
+
+        if best is None or rtt < best['rtt']:
+            best = dict(skew=round(skew, 6), rtt=round(rtt, 6))
+
+    return best
+
+
+def verify_datetime(content, datetime_systems, max_skew):
+    time_skew = {}
+
+    def check(name):
+        time_skew[name] = measure_skew(datetime_systems[name])
+
+    for name, e in run_parallel(content, check, datetime_systems.keys()):
+        time_skew[name] = dict(msg=getattr(e, 'msg', None) or str(e))
+
+    out_of_sync = sorted(name for name, result in time_skew.items()
+                         if 'msg' in result or abs(result['skew']) > max_skew)
+
+    return time_skew, out_of_sync
+
+
 def main():
 
     argument_spec = vmware_argument_spec()
-    argument_spec.update(dict(ntp_servers=dict(required=True, type='list'),
-                              ntpd_state=dict(default='running', choices=['running', 'stopped', 'restarted'], type='str'),
-                              timezone=dict(type='str')))
+    argument_spec.update(dict(ntp_servers=dict(type='list'),
+                              ntpd_state=dict(choices=['running', 'stopped', 'restarted'], type='str'),
+                              timezone=dict(type='str'),
+                              verify=dict(default=False, type='bool'),
+                              max_skew=dict(default=1.0, type='float'),
+                              cluster_name=dict(type='str'),
+                              datacenter_name=dict(type='str')))
 
-    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False,
+                           mutually_exclusive=[['cluster_name', 'datacenter_name']],
+                           required_if=[['verify', False, ['ntp_servers']]])
 
     ntp_servers = module.params['ntp_servers']
     ntpd_state = module.params['ntpd_state']
     timezone = module.params['timezone']
+    verify = module.params['verify']
+    max_skew = module.params['max_skew']
+    cluster_name = module.params['cluster_name']
+    datacenter_name = module.params['datacenter_name']
 
     if not HAS_PYVMOMI:
         module.fail_json(msg='pyvmomi is required for this module')
 
+    if not verify and (cluster_name or datacenter_name):
+        module.fail_json(msg='cluster_name and datacenter_name can only be used with verify')
+
+    if verify and (ntp_servers or ntpd_state or timezone):
+        module.fail_json(msg='ntp_servers, ntpd_state and timezone cannot be used with verify')
+
+    if ntpd_state is None:
+        ntpd_state = 'running'
+
     try:
         content = connect_to_api(module)
+
+        if verify:
+            if cluster_name:
+                container = find_cluster_by_name(content, cluster_name)
+                if container is None:
+                    module.fail_json(msg='Unable to find cluster {0}'.format(cluster_name))
+            elif datacenter_name:
+                container = find_datacenter_by_name(content, datacenter_name)
+                if container is None:
+                    module.fail_json(msg='Unable to find datacenter {0}'.format(datacenter_name))
+            else:
+                container = content.rootFolder
+
+            datetime_systems, skipped = get_datetime_systems(content, container)
+            if not datetime_systems and not skipped:
+                module.fail_json(msg="Unable to locate Physical Host.")
+
+            time_skew, out_of_sync = verify_datetime(content, datetime_systems, max_skew)
+            module.exit_json(changed=False, time_skew=time_skew, hosts_out_of_sync=out_of_sync,
+                             skipped_hosts=skipped)
+
         host = get_all_objs(content, [vim.HostSystem])
         if not host:
             module.fail_json(msg="Unable to locate Physical Host.")
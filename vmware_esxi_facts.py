@@ -58,16 +58,122 @@ RETURN = '''
 '''
 
 try:
-    from pyVmomi import vim, vmodl
+    from pyVmomi import vim, vmodl, VmomiSupport
     HAS_PYVMOMI = True
 except ImportError:
     HAS_PYVMOMI = False
 
+import datetime
+import operator
+
 from ansible.module_utils.vmware import *
 from ansible.module_utils.basic import *
+from ansible.module_utils.six import binary_type, integer_types, text_type
 
 SUPPORTED_TYPES = ['all', 'hardware', 'network', 'storage', 'datastore', 'system']
 
+# Attributes returned for each vim data object type, keyed by the vmodl name
+# of the type. Subclasses (e.g. vim.host.ScsiDisk) use the table of the first
+# base type listed here. Data objects without a table get all of their
+# properties.
+FIELD_TABLES = {
+    'vim.AboutInfo': ('name', 'fullName', 'vendor', 'version', 'build',
+                      'localeVersion', 'localeBuild', 'osType', 'productLineId',
+                      'apiType', 'apiVersion', 'instanceUuid',
+                      'licenseProductName', 'licenseProductVersion'),
+    'vim.Datastore.Info': ('url', 'containerId', 'timestamp'),
+    'vim.host.Summary.HardwareSummary': ('vendor', 'model', 'uuid', 'cpuModel', 'cpuMhz',
+                                         'numCpuPkgs', 'numCpuCores', 'numCpuThreads',
+                                         'numNics', 'numHBAs'),
+    'vim.host.PhysicalNic': ('driver', 'mac', 'pci'),
+    'vim.host.PortGroup.Specification': ('name', 'vlanId', 'vswitchName'),
+    'vim.host.HostProxySwitch': ('dvsName', 'dvsUuid', 'numPorts', 'configNumPorts',
+                                 'numPortsAvailable', 'mtu', 'networkReservationSupported'),
+    'vim.host.VirtualSwitch': ('name', 'numPorts', 'numPortsAvailable', 'mtu'),
+    'vim.host.HostBusAdapter': ('key', 'bus', 'status', 'model', 'driver', 'pci'),
+    'vim.host.ScsiLun': ('displayName', 'lunType', 'vendor', 'revision', 'scsiLevel'),
+}
+
+# Values of these types are returned as they are.
+PLAIN_TYPES = (type(None), bool, int, float, text_type, binary_type)
+
+# Base properties of every data object, which are never returned.
+DYNAMIC_DATA_FIELDS = ('dynamicType', 'dynamicProperty')
+
+# Per-type converters, filled in on first use of a type.
+_CONVERTERS = {}
+
+
+def _field_table(cls):
+    for klass in cls.__mro__:
+        if klass.__name__ in FIELD_TABLES:
+            return FIELD_TABLES[klass.__name__]
+    return tuple(p.name for p in cls._GetPropertyList() if p.name not in DYNAMIC_DATA_FIELDS)
+
+
+def _build_data_converter(cls):
+    fields = _field_table(cls)
+    if not fields:
+        return lambda v: {}
+
+    if len(fields) == 1:
+        getter = lambda v, get=operator.attrgetter(fields[0]): (get(v),)
+    else:
+        getter = operator.attrgetter(*fields)
+
+    # Fields declared as a plain scalar are copied as they are, only the
+    # others (enums, shorts, longs, datetimes, arrays, nested data objects)
+    # go through to_facts().
+    converted = tuple(f for f in fields if cls._GetPropertyInfo(f).type not in PLAIN_TYPES)
+
+    def converter(value):
+        facts = dict(zip(fields, getter(value)))
+        for f in converted:
+            facts[f] = to_facts(facts[f])
+        return facts
+
+    return converter
+
+
+def _build_converter(cls):
+    if cls in PLAIN_TYPES:
+        return None
+    if issubclass(cls, bool):
+        return bool
+    if issubclass(cls, integer_types):
+        return int
+    if issubclass(cls, float):
+        return float
+    # Enum values and pyVmomi string types are str subclasses.
+    if issubclass(cls, text_type):
+        return text_type
+    if issubclass(cls, binary_type):
+        return binary_type
+    if issubclass(cls, datetime.datetime):
+        return lambda v: v.isoformat()
+    if issubclass(cls, VmomiSupport.ManagedObject):
+        return lambda v: v._moId
+    if issubclass(cls, vmodl.DynamicData):
+        return _build_data_converter(cls)
+    if issubclass(cls, (list, tuple)):
+        if getattr(cls, 'Item', None) in PLAIN_TYPES:
+            return list
+        return lambda v: [to_facts(i) for i in v]
+    return None
+
+
+def to_facts(value):
+    """Convert a pyVmomi value into plain dicts, lists and scalars."""
+    cls = type(value)
+    try:
+        converter = _CONVERTERS[cls]
+    except KeyError:
+        converter = _CONVERTERS[cls] = _build_converter(cls)
+
+    if converter is None:
+        return value
+    return converter(value)
+
 
 class EsxiFacts(object):
 
@@ -84,18 +190,8 @@ class EsxiFacts(object):
         return self.facts
 
     def get_system_facts(self):
-        facts = dict()
-
         # vim.AboutInfo
-        product_info = self.host_system.config.product
-
-        for attr in ['name', 'fullName', 'vendor', 'version', 'build',
-                     'localeVersion', 'localeBuild', 'osType', 'productLineId',
-                     'apiType', 'apiVersion', 'instanceUuid',
-                     'licenseProductName', 'licenseProductVersion']:
-            facts[attr] = getattr(product_info, attr)
-
-        return facts
+        return to_facts(self.host_system.config.product)
 
     def get_datastore_facts(self):
         facts = dict()
@@ -107,25 +203,18 @@ class EsxiFacts(object):
             # vim.Datastore.Info
             datastore_info = datastore.info
 
-            facts[datastore_info.name] = {}
-            for attr in ['url', 'containerId', 'timestamp']:
-                facts[datastore_info.name][attr] = getattr(datastore_info, attr)
+            facts[datastore_info.name] = to_facts(datastore_info)
 
             for attr in ['freeSpace', 'maxFileSize', 'maxVirtualDiskCapacity']:
                 facts[datastore_info.name][attr] = bytes_to_human(getattr(datastore_info, attr))
         return facts
 
     def get_hardware_facts(self):
-        facts = dict()
-
         # vim.host.Summary.HardwareSummary
         hardware = self.host_system.summary.hardware
 
+        facts = to_facts(hardware)
         facts['total_memory'] = bytes_to_human(hardware.memorySize)
-
-        for attr in ['vendor', 'model', 'uuid', 'cpuModel', 'cpuMhz',
-                     'numCpuPkgs', 'numCpuCores', 'numCpuThreads', 'numNics', 'numHBAs']:
-            facts[attr] = getattr(hardware, attr)
         return facts
 
     def get_network_facts(self):
@@ -136,11 +225,7 @@ class EsxiFacts(object):
 
         # vim.host.PhysicalNic
         for nic in network_info.pnic:
-            facts['pnics'][nic.device] = dict(
-                driver=nic.driver,
-                mac=nic.mac,
-                pci=nic.pci,
-            )
+            facts['pnics'][nic.device] = to_facts(nic)
 
             # Now, some machines don't set nic.linkSpeed correctly
             try:
@@ -176,25 +261,15 @@ class EsxiFacts(object):
 
         # vim.host.PortGroup
         for pg in network_info.portgroup:
-            facts['portgroups'][pg.key] = dict(
-                name=pg.spec.name,
-                vlanId=pg.spec.vlanId,
-                vswitchName=pg.spec.vswitchName,
-            )
+            facts['portgroups'][pg.key] = to_facts(pg.spec)
 
         # vim.host.HostProxySwitch
         for psw in network_info.proxySwitch:
-            facts['proxySwitch'][psw.key] = {}
-            for attr in ['dvsName', 'dvsUuid', 'numPorts', 'numPorts',
-                         'configNumPorts', 'numPortsAvailable', 'mtu',
-                         'networkReservationSupported']:
-                facts['proxySwitch'][psw.key][attr] = getattr(psw, attr)
+            facts['proxySwitch'][psw.key] = to_facts(psw)
 
         # vim.host.VirtualSwitch
         for vsw in network_info.vswitch:
-            facts['vswitch'][vsw.key] = {}
-            for attr in ['name', 'numPorts', 'numPortsAvailable', 'mtu']:
-                facts['vswitch'][vsw.key][attr] = getattr(vsw, attr)
+            facts['vswitch'][vsw.key] = to_facts(vsw)
 
         return facts
 
@@ -202,26 +277,24 @@ class EsxiFacts(object):
         facts = dict(hba={}, lun={}, multipath={}, systemfile=[], mountinfo={})
 
         # vim.host.StorageSystem
-        facts['systemfile'] = self.host_system.configManager.storageSystem.systemFile
+        # Resolve the storage system once; every configManager access is a
+        # separate round trip to the server.
+        storage_system = self.host_system.configManager.storageSystem
+        facts['systemfile'] = to_facts(storage_system.systemFile)
 
         # vim.host.StorageDeviceInfo
-        storage_device_info = self.host_system.configManager.storageSystem.storageDeviceInfo
+        storage_device_info = storage_system.storageDeviceInfo
         for hba in storage_device_info.hostBusAdapter:
-            facts['hba'][hba.device] = {}
-            for attr in ['key', 'bus', 'status', 'model', 'driver', 'pci']:
-                facts['hba'][hba.device][attr] = getattr(hba, attr)
+            facts['hba'][hba.device] = to_facts(hba)
 
         for lun in storage_device_info.scsiLun:
-            facts['lun'][lun.uuid] = {}
-            for attr in ['displayName', 'lunType', 'vendor', 'revision', 'scsiLevel']:
-                facts['lun'][lun.uuid][attr] = getattr(lun, attr)
+            facts['lun'][lun.uuid] = to_facts(lun)
 
         # vim.host.FileSystemVolumeInfo
-        filesystem_volume_info = self.host_system.configManager.storageSystem.fileSystemVolumeInfo
-        facts['volumeTypeList'] = filesystem_volume_info.volumeTypeList
+        filesystem_volume_info = storage_system.fileSystemVolumeInfo
+        facts['volumeTypeList'] = to_facts(filesystem_volume_info.volumeTypeList)
 
         for m in filesystem_volume_info.mountInfo:
-            facts['mountinfo'][m.volume.name] = {}
             facts['mountinfo'][m.volume.name] = dict(
                 capacity=bytes_to_human(m.volume.capacity),
                 type=m.volume.type,
@@ -236,7 +309,7 @@ class EsxiFacts(object):
                 facts['mountinfo'][m.volume.name]['inaccessibleReason'] = m.mountInfo.inaccessibleReason
 
         # vim.host.MultipathStateInfo
-        multipath_state_info = self.host_system.configManager.storageSystem.multipathStateInfo
+        multipath_state_info = storage_system.multipathStateInfo
         for p in multipath_state_info.path:
             facts['multipath'][p.name] = p.pathState
 
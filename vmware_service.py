@@ -56,6 +56,18 @@ options:
         firewall ports.
     choices: [ on, off, automatic ]
     default: on
+  cluster_name:
+    required: false
+    description:
+      - Name of a cluster. When given, the service is managed on every host
+        in this cluster instead of on a single host.
+      - Mutually exclusive with I(datacenter_name).
+  datacenter_name:
+    required: false
+    description:
+      - Name of a datacenter. When given, the service is managed on every host
+        in this datacenter instead of on a single host.
+      - Mutually exclusive with I(cluster_name).
 '''
 
 EXAMPLES = '''
@@ -69,6 +81,33 @@ EXAMPLES = '''
     name: 'TSM-SSH'
     state: running
     policy: automatic
+
+- name: Make sure ssh is stopped on all hosts in a cluster
+  local_action:
+    module: vmware_service
+    hostname: vcenter_hostname
+    username: administrator@vsphere.local
+    password: your_password
+    cluster_name: cluster-001
+    name: 'TSM-SSH'
+    state: stopped
+    policy: off
+'''
+
+RETURN = '''
+hosts:
+    description: Per host list of the service calls that were made, only
+                 returned when I(cluster_name) or I(datacenter_name) is used.
+    returned: success
+    type: dict
+    sample: {"esxi-001.example.com": ["StopService", "UpdateServicePolicy"]}
+skipped_hosts:
+    description: Hosts that were left alone because they are not connected,
+                 only returned when I(cluster_name) or I(datacenter_name) is
+                 used.
+    returned: success
+    type: list
+    sample: ["esxi-002.example.com"]
 '''
 try:
     from pyVmomi import vim, vmodl
@@ -76,39 +115,163 @@ try:
 except ImportError:
     HAS_PYVMOMI = False
 
+import threading
 
-def manage_service(module, host_system, name, state, policy):
-    changed = False
+# Maximum number of hosts worked on concurrently. The number of workers is
+# also capped at the size of pyVmomi's HTTP connection pool, so that every
+# call reuses a pooled keep-alive connection instead of opening its own.
+#
+# PARALLEL_HOSTS, get_host_properties() and run_parallel() are kept identical
+# in vmware_service.py and vmware_datetime_config.py, as every module has to
+# be self-contained.
+PARALLEL_HOSTS = 16
 
-    host_config_manager = host_system.configManager
-    host_service_system = host_config_manager.serviceSystem
-    services = host_service_system.serviceInfo.service
 
+def get_host_properties(content, container, path_set):
+    # Fetch the name, connection state and given properties of every host
+    # below the container in a single PropertyCollector retrieval.
+    view = content.viewManager.CreateContainerView(container, [vim.HostSystem], True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseEntities', path='view', skip=False, type=vim.view.ContainerView)
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=view, skip=True, selectSet=[traversal_spec])
+        property_spec = vmodl.query.PropertyCollector.PropertySpec(
+            type=vim.HostSystem, pathSet=['name', 'runtime.connectionState'] + path_set)
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[object_spec], propSet=[property_spec])
+
+        collector = content.propertyCollector
+        result = collector.RetrievePropertiesEx([filter_spec], vmodl.query.PropertyCollector.RetrieveOptions())
+        objects = []
+        while result:
+            objects.extend(result.objects)
+            if not result.token:
+                break
+            result = collector.ContinueRetrievePropertiesEx(result.token)
+    finally:
+        view.Destroy()
+
+    return [dict((p.name, p.val) for p in obj.propSet) for obj in objects]
+
+
+def run_parallel(content, func, items):
+    # Run func for every item and return the (item, exception) pairs of the
+    # calls that failed. Without a known pool size the items are handled one
+    # at a time over a single connection.
+    stub = content.propertyCollector._stub
+    pool_size = getattr(getattr(stub, 'soapStub', stub), 'poolSize', 1)
+
+    items = list(items)
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not items:
+                    return
+                item = items.pop()
+            try:
+                func(item)
+            except Exception as e:
+                with lock:
+                    errors.append((item, e))
+
+    threads = [threading.Thread(target=worker) for i in range(min(PARALLEL_HOSTS, pool_size, len(items)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return errors
+
+
+def find_service(module, services, name, host_name=None):
     # Make sure the service exists by the given name
     service_lst = [s for s in services if s.key == name]
 
     if len(service_lst) < 1:
-        module.fail_json(msg='Could not find service {0} to manage'.format(name))
+        msg = 'Could not find service {0} to manage'.format(name)
+        if host_name:
+            msg += ' on {0}'.format(host_name)
+        module.fail_json(msg=msg)
+
+    return service_lst[0]
+
 
-    service = service_lst[0]
+def service_actions(service, state, policy):
+    actions = []
 
     # First manage the service state
     if state == 'restarted':
-        host_service_system.RestartService(name)
-        changed = True
+        actions.append(('RestartService', (service.key,)))
     elif state == 'running' and not service.running:
-        host_service_system.StartService(name)
-        changed = True
+        actions.append(('StartService', (service.key,)))
     elif state == 'stopped' and service.running:
-        host_service_system.StopService(name)
-        changed = True
+        actions.append(('StopService', (service.key,)))
 
     # Determine if the service needs to be started at boot.
     if policy != service.policy:
-        host_service_system.UpdateServicePolicy(name, policy)
-        changed = True
+        actions.append(('UpdateServicePolicy', (service.key, policy)))
+
+    return actions
+
+
+def apply_actions(host_service_system, actions, done=None):
+    # Methods that completed are appended to done, so that callers can tell
+    # what was changed when a later call fails.
+    for method, args in actions:
+        getattr(host_service_system, method)(*args)
+        if done is not None:
+            done.append(method)
+
+
+def manage_service(module, host_system, name, state, policy):
+    host_config_manager = host_system.configManager
+    host_service_system = host_config_manager.serviceSystem
+    services = host_service_system.serviceInfo.service
 
-    return changed
+    service = find_service(module, services, name)
+    actions = service_actions(service, state, policy)
+    apply_actions(host_service_system, actions)
+
+    return len(actions) > 0
+
+
+def manage_service_scope(module, content, container, name, state, policy):
+    hosts = get_host_properties(content, container, ['config.service', 'configManager.serviceSystem'])
+    if not hosts:
+        module.fail_json(msg='Unable to locate any Physical Host.')
+
+    # Work out which hosts are out of compliance locally, so that only those
+    # hosts are contacted. Disconnected and not responding hosts come back
+    # without their configuration and are skipped.
+    pending = {}
+    skipped = []
+    for host in hosts:
+        service_info = host.get('config.service')
+        host_service_system = host.get('configManager.serviceSystem')
+        if host.get('runtime.connectionState') != 'connected' or service_info is None or host_service_system is None:
+            skipped.append(host['name'])
+            continue
+
+        service = find_service(module, service_info.service, name, host['name'])
+        actions = service_actions(service, state, policy)
+        if actions:
+            pending[host['name']] = (host_service_system, actions)
+
+    done = dict((h, []) for h in pending)
+    errors = run_parallel(content, lambda h: apply_actions(pending[h][0], pending[h][1], done[h]), pending.keys())
+    changed_hosts = dict((h, methods) for h, methods in done.items() if methods)
+    skipped.sort()
+
+    if errors:
+        msg = '; '.join('{0}: {1}'.format(h, getattr(e, 'msg', None) or str(e)) for h, e in errors)
+        module.fail_json(msg='Failed to manage service {0}: {1}'.format(name, msg),
+                         changed=len(changed_hosts) > 0, hosts=changed_hosts, skipped_hosts=skipped)
+
+    return changed_hosts, skipped
 
 
 def main():
@@ -116,19 +279,38 @@ def main():
     argument_spec = vmware_argument_spec()
     argument_spec.update(dict(name=dict(aliases=['service'], required=True, type='str'),
                               state=dict(default='running', choices=['running', 'stopped', 'restarted'], type='str'),
-                              policy=dict(default='on', aliases=['enabled'], choices=['on', 'off', 'automatic'], type='str')))
+                              policy=dict(default='on', aliases=['enabled'], choices=['on', 'off', 'automatic'], type='str'),
+                              cluster_name=dict(type='str'),
+                              datacenter_name=dict(type='str')))
 
-    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=False,
+                           mutually_exclusive=[['cluster_name', 'datacenter_name']])
 
     name = module.params['name']
     state = module.params['state']
     policy = module.params['policy']
+    cluster_name = module.params['cluster_name']
+    datacenter_name = module.params['datacenter_name']
 
     if not HAS_PYVMOMI:
         module.fail_json(msg='pyvmomi is required for this module')
 
     try:
         content = connect_to_api(module)
+
+        if cluster_name or datacenter_name:
+            if cluster_name:
+                container = find_cluster_by_name(content, cluster_name)
+                if container is None:
+                    module.fail_json(msg='Unable to find cluster {0}'.format(cluster_name))
+            else:
+                container = find_datacenter_by_name(content, datacenter_name)
+                if container is None:
+                    module.fail_json(msg='Unable to find datacenter {0}'.format(datacenter_name))
+
+            hosts, skipped = manage_service_scope(module, content, container, name, state, policy)
+            module.exit_json(changed=len(hosts) > 0, hosts=hosts, skipped_hosts=skipped)
+
         host = get_all_objs(content, [vim.HostSystem])
         if not host:
             module.fail_json(msg="Unable to locate Physical Host.")